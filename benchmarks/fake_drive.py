@@ -0,0 +1,69 @@
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Servidor HTTP local no lugar do Drive, para testar o download com retomada (Range + If-Range) sem rede.
+# `content` pode ser trocado a qualquer momento (nova versão remota, ETag novo); `cut_after` derruba a
+# próxima resposta depois de N bytes, simulando uma conexão interrompida.
+
+
+class FakeDrive:
+    def __init__(self, content=b""):
+        self.content = content
+        self.cut_after = None
+        self.responses = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True, name="fake-drive")
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self._server.server_port}/corpus.pdf"
+
+    @property
+    def etag(self):
+        return '"' + hashlib.sha256(self.content).hexdigest()[:16] + '"'
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler(self):
+        drive = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                with drive._lock:
+                    content, etag, cut_after, drive.cut_after = drive.content, drive.etag, drive.cut_after, None
+                start = 0
+                range_header = self.headers.get("Range", "")
+                if range_header.startswith("bytes=") and self.headers.get("If-Range", etag) == etag:
+                    start = int(range_header[6:].split("-")[0] or 0)
+                if start >= len(content) and start:
+                    drive.responses.append(416)
+                    self.send_response(416)
+                    self.send_header("Content-Range", f"bytes */{len(content)}")
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                body = content[start:]
+                drive.responses.append(206 if start else 200)
+                self.send_response(206 if start else 200)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", str(len(body)))
+                if start:
+                    self.send_header("Content-Range", f"bytes {start}-{len(content) - 1}/{len(content)}")
+                self.end_headers()
+                self.wfile.write(body if cut_after is None else body[:cut_after])
+                if cut_after is not None:
+                    self.close_connection = True
+
+        return Handler
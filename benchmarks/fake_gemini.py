@@ -0,0 +1,86 @@
+import itertools
+import threading
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+# Client falso com a mesma interface usada do genai.Client (models.generate_content[_stream] e caches),
+# com latência e tamanho de resposta configuráveis. Não acessa a rede.
+
+FILLER = "Segundo o material, o framework recomendado combina diagnóstico, alternativas e plano de ação. "
+
+
+def count_tokens(contents, config=None):
+    texts = [contents] if isinstance(contents, str) else [p.text or "" for c in contents for p in c.parts]
+    if config is not None and getattr(config, "system_instruction", None):
+        texts.append(config.system_instruction)
+    return sum(len(text) for text in texts) // 4
+
+
+class FakeModels:
+    def __init__(self, latency=0.5, ttft=0.2, output_tokens=300, chunks=20):
+        self.latency = latency
+        self.ttft = ttft
+        self.output_tokens = output_tokens
+        self.chunks = chunks
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _answer(self):
+        return (FILLER * (self.output_tokens * 4 // len(FILLER) + 1))[:self.output_tokens * 4]
+
+    def _usage(self, contents, config):
+        cached = 0 if getattr(config, "cached_content", None) is None else 800
+        return SimpleNamespace(prompt_token_count=count_tokens(contents, config) + cached, cached_content_token_count=cached, candidates_token_count=self.output_tokens)
+
+    def generate_content(self, model, contents, config=None):
+        with self._lock: self.calls += 1
+        time.sleep(self.latency)
+        return SimpleNamespace(text=self._answer(), usage_metadata=self._usage(contents, config))
+
+    def generate_content_stream(self, model, contents, config=None):
+        with self._lock: self.calls += 1
+        text = self._answer()
+        size = max(len(text) // self.chunks, 1)
+        pieces = [text[i:i + size] for i in range(0, len(text), size)]
+        time.sleep(self.ttft)
+        for i, piece in enumerate(pieces):
+            if i: time.sleep(max(self.latency - self.ttft, 0) / max(len(pieces) - 1, 1))
+            last = i == len(pieces) - 1
+            yield SimpleNamespace(text=piece, usage_metadata=self._usage(contents, config) if last else None)
+
+
+class FakeCaches:
+    # Imita o contrato da API: recusa prompts abaixo do mínimo de tokens e conta as chamadas de cada tipo
+    def __init__(self, min_tokens=1024, clock=time.time):
+        self.min_tokens = min_tokens
+        self.clock = clock
+        self.calls = {"create": 0, "list": 0, "update": 0}
+        self._items = {}
+        self._ids = itertools.count()
+
+    def _expiry(self, ttl):
+        return datetime.fromtimestamp(self.clock() + int(str(ttl).rstrip("s")), tz=timezone.utc)
+
+    def create(self, model, config):
+        self.calls["create"] += 1
+        if count_tokens(config.system_instruction) < self.min_tokens:
+            raise ValueError(f"cached content is too small (minimum {self.min_tokens} tokens)")
+        cached = SimpleNamespace(name=f"cachedContents/fake-{next(self._ids)}", display_name=config.display_name, expire_time=self._expiry(config.ttl))
+        self._items[cached.name] = cached
+        return cached
+
+    def list(self):
+        self.calls["list"] += 1
+        return list(self._items.values())
+
+    def update(self, name, config):
+        self.calls["update"] += 1
+        self._items[name].expire_time = self._expiry(config.ttl)
+        return self._items[name]
+
+
+class FakeGeminiClient:
+    def __init__(self, latency=0.5, ttft=0.2, output_tokens=300, clock=time.time):
+        self.models = FakeModels(latency, ttft, output_tokens)
+        self.caches = FakeCaches(clock=clock)
@@ -0,0 +1,282 @@
+import argparse
+import hashlib
+import json
+import os
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import mentor  # noqa: E402
+from bootstrap import fetch_pdf, fetch_update  # noqa: E402
+from context_cache import ContextCacheManager  # noqa: E402
+from benchmarks.fake_drive import FakeDrive  # noqa: E402
+from benchmarks.fake_gemini import FakeGeminiClient  # noqa: E402
+from benchmarks.synthetic_pdf import write_pdf  # noqa: E402
+from corpus_cache import file_sha256, load_index  # noqa: E402
+from history import new_history_state  # noqa: E402
+from metrics import percentile  # noqa: E402
+from prompts import system_prompt  # noqa: E402
+from retrieval import BM25Index  # noqa: E402
+
+# Benchmark offline: mede o custo do próprio app (ingestão, montagem do prompt, histórico, reruns)
+# separado da latência do modelo, usando um Gemini falso e um PDF sintético.
+#   python -m benchmarks.run --pages 300 --sessions 16 --turns 6 --out bench.json
+
+QUESTIONS = [
+    ("Consultor", "pt", "Como o BATNA ajuda em uma negociação difícil?"),
+    ("Consultor", "en", "What is the difference between Cash Flow and Profit in the text?"),
+    ("Quiz", "pt", "Inicie um Quiz sobre ROI e análise financeira."),
+    ("Roleplay", "pt", "Atue como um cliente irritado com um atraso. Eu sou o gerente."),
+]
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def distribution(values, scale=1000.0):
+    # Percentis em milissegundos
+    if not values:
+        return {}
+    return {
+        "n": len(values),
+        "mean_ms": sum(values) / len(values) * scale,
+        "p50_ms": percentile(values, 50) * scale,
+        "p95_ms": percentile(values, 95) * scale,
+        "p99_ms": percentile(values, 99) * scale,
+        "max_ms": max(values) * scale,
+    }
+
+
+def bench_ingest(pdf_path, workdir, settings):
+    text, extract_time = timed(mentor.load_pdf_text, pdf_path, backend=settings.pdf_backend, workers=settings.pdf_workers)
+    index, build_time = timed(BM25Index.build, text, chunk_size=settings.retrieval_chunk_size)
+    settings.corpus_cache_dir = os.path.join(workdir, "cache")
+    cold, cold_time = timed(mentor.build_retrieval_index, pdf_path, settings)
+    artifact = next(os.path.join(settings.corpus_cache_dir, f) for f in os.listdir(settings.corpus_cache_dir) if f.endswith(".hmc"))
+    _, warm_time = timed(load_index, artifact)
+    return cold, {
+        "pages": index.page_count,
+        "chunks": len(index),
+        "corpus_tokens": index.total_tokens,
+        "extract_s": extract_time,
+        "index_build_s": build_time,
+        "cold_start_s": cold_time,
+        "warm_start_s": warm_time,
+        "artifact_bytes": os.path.getsize(artifact),
+    }
+
+
+def bench_prompt(mentor_obj, index, settings, repeats=50):
+    results = {}
+    for history_len in (1, 11, 41):
+        history = []
+        for i in range(history_len):
+            role = "user" if i % 2 == 0 else "assistant"
+            history.append({"role": role, "content": f"{QUESTIONS[i % len(QUESTIONS)][2]} " * (1 if role == "user" else 20)})
+        retrieve, build = [], []
+        for _ in range(repeats):
+            (context_text, _), elapsed = timed(mentor.retrieve_context, index, history, "Consultor", settings.retrieval_top_k)
+            retrieve.append(elapsed)
+            state = new_history_state()
+            _, elapsed = timed(mentor_obj.build_gemini_request, history, "Consultor", "pt", context_text, state)
+            build.append(elapsed)
+        results[f"history_{history_len}"] = {"retrieve": distribution(retrieve), "build_request": distribution(build)}
+    return results
+
+
+def bench_context_cache(ttl=3600, margin=300):
+    # Ciclo de vida do cache de contexto contra o FakeCaches, com relógio simulado. Cada passo registra o
+    # cache usado e as chamadas à API: prompt pequeno demais (nenhuma), criação, reuso, renovação antes de
+    # expirar, reaproveitamento por outro processo e prompt alterado (cache novo)
+    now = [time.time()]
+    clock = lambda: now[0]
+    client = FakeGeminiClient(clock=clock)
+    new_manager = lambda: ContextCacheManager(client, mentor.GEMINI_MODEL, ttl_seconds=ttl, refresh_margin=margin, clock=clock)
+    manager = new_manager()
+    key = ("Consultor", "pt")
+    large_prompt = system_prompt(*key) * 4
+    steps = {}
+
+    def step(name, fn):
+        before = dict(client.caches.calls)
+        steps[name] = {"cache": fn(), **{call: client.caches.calls[call] - before[call] for call in before}}
+
+    step("short_prompt", lambda: manager.get(key, system_prompt(*key)))
+    step("create", lambda: manager.get(key, large_prompt))
+    step("reuse", lambda: manager.get(key, large_prompt))
+    now[0] += ttl - margin / 2
+    step("refresh", lambda: manager.get(key, large_prompt))
+    step("other_process", lambda: new_manager().get(key, large_prompt))
+    step("prompt_changed", lambda: manager.get(key, large_prompt + "\n"))
+    return steps
+
+
+def bench_download(workdir):
+    # Download com retomada contra o FakeDrive (stand-in HTTP do Drive). Cada passo registra se o arquivo
+    # final confere com a versão remota e os status HTTP servidos: conexão cortada, retomada (206),
+    # versão remota trocada no meio do download (200, recomeça), .part já completo (416) e atualização
+    with open(write_pdf(os.path.join(workdir, "remote-v1.pdf"), n_pages=40), "rb") as f:
+        v1 = f.read()
+    with open(write_pdf(os.path.join(workdir, "remote-v2.pdf"), n_pages=40, seed=7), "rb") as f:
+        v2 = f.read()
+    target = os.path.join(workdir, "download", "corpus.pdf")
+    steps = {}
+    with FakeDrive(v1) as drive:
+        def step(name, fn, expected):
+            served = len(drive.responses)
+            result, elapsed = timed(fn)
+            matches = os.path.exists(target) and file_sha256(target) == hashlib.sha256(expected).hexdigest()
+            steps[name] = {"result": result, "matches_remote": matches, "responses": drive.responses[served:], "s": elapsed}
+
+        drive.cut_after = len(v1) // 2
+        step("interrupted", lambda: fetch_pdf(target, url=drive.url), b"")
+        step("resumed", lambda: fetch_pdf(target, url=drive.url), v1)
+        os.remove(target)
+        drive.cut_after = len(v1) // 2
+        fetch_pdf(target, url=drive.url)
+        drive.content = v2
+        step("remote_changed", lambda: fetch_pdf(target, url=drive.url), v2)
+        os.replace(target, target + ".part")
+        with open(target + ".part.validator", "w") as f:
+            f.write(drive.etag)
+        step("complete_part", lambda: fetch_pdf(target, url=drive.url), v2)
+        drive.content = v1
+        step("update", lambda: fetch_update(target, url=drive.url, min_age=0), v1)
+    return steps
+
+
+def run_session(mentor_obj, index, settings, session_no, turns, model_latency, out, sessions_state):
+    mode, lang, question = QUESTIONS[session_no % len(QUESTIONS)]
+    messages, state = [], new_history_state()
+    sessions_state.append((messages, state))
+    for turn in range(turns):
+        messages.append({"role": "user", "content": question if turn == 0 else "B"})
+        stats = {}
+        start = time.perf_counter()
+        context_text, context_stats = mentor.retrieve_context(index, messages, mode, settings.retrieval_top_k)
+        stats.update(context_stats)
+        if settings.streaming:
+            text = "".join(mentor_obj.stream_gemini_response(messages, mode, lang, context_text, state, stats))
+        else:
+            text = mentor_obj.get_gemini_response(messages, mode, lang, context_text, state, stats)
+        total = time.perf_counter() - start
+        messages.append({"role": "assistant", "content": text})
+        out.append({"latency": total, "ttft": stats.get("ttft"), "overhead": total - model_latency, "prompt_tokens": stats.get("prompt_tokens", 0)})
+
+
+def bench_sessions(mentor_obj, index, settings, sessions, turns, model_latency):
+    out, sessions_state = [], []
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    threads = [threading.Thread(target=run_session, args=(mentor_obj, index, settings, i, turns, model_latency, out, sessions_state)) for i in range(sessions)]
+    start = time.perf_counter()
+    for thread in threads: thread.start()
+    for thread in threads: thread.join()
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    prompt_tokens = [r["prompt_tokens"] for r in out]
+    return {
+        "sessions": sessions,
+        "turns_per_session": turns,
+        "wall_s": elapsed,
+        "throughput_turns_per_s": len(out) / elapsed if elapsed else 0.0,
+        "latency": distribution([r["latency"] for r in out]),
+        "ttft": distribution([r["ttft"] for r in out if r["ttft"] is not None]),
+        "app_overhead": distribution([max(r["overhead"], 0.0) for r in out]),
+        "prompt_tokens_mean": sum(prompt_tokens) / len(prompt_tokens) if prompt_tokens else 0,
+        "prompt_tokens_max": max(prompt_tokens) if prompt_tokens else 0,
+        "memory_per_session_bytes": (current - baseline) / sessions if sessions else 0,
+        "peak_traced_bytes": peak - baseline,
+    }
+
+
+def bench_apptest(workdir, pdf_path, fake_client, settings, sessions, turns):
+    # Roda o script do Streamlit de verdade (AppTest), com o client falso injetado, e mede o custo de cada rerun
+    from streamlit.testing.v1 import AppTest
+
+    app_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+    shutil.copy(pdf_path, os.path.join(workdir, "Harvard Manager Mentor.pdf"))
+    original_create_client, original_cwd = mentor.create_client, os.getcwd()
+    mentor.create_client = lambda *args, **kwargs: fake_client
+    os.chdir(workdir)
+    first_run, reruns = [], []
+    try:
+        for session_no in range(sessions):
+            at = AppTest.from_file(app_path, default_timeout=120)
+            at.secrets["GOOGLE_API_KEY"] = "fake"
+            at.secrets["CORPUS_CACHE_DIR"] = settings.corpus_cache_dir
+            at.secrets["STREAMING"] = str(settings.streaming).lower()
+            _, elapsed = timed(at.run)
+            first_run.append(elapsed)
+            # A biblioteca é carregada em segundo plano; o chat só libera quando o índice fica pronto
+            while at.chat_input[0].disabled:
+                time.sleep(0.05)
+                at.run()
+            for turn in range(turns):
+                question = QUESTIONS[(session_no + turn) % len(QUESTIONS)][2] + f" ({session_no}.{turn})"
+                _, elapsed = timed(at.chat_input[0].set_value(question).run)
+                reruns.append(elapsed - fake_client.models.latency)
+            if at.exception:
+                raise RuntimeError(at.exception[0].value)
+    finally:
+        mentor.create_client = original_create_client
+        os.chdir(original_cwd)
+    return {"first_run": distribution(first_run), "turn_rerun_overhead": distribution(reruns)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmark of Harvard Mentor AI with a fake Gemini backend")
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--sessions", type=int, default=16)
+    parser.add_argument("--turns", type=int, default=6)
+    parser.add_argument("--latency", type=float, default=0.5, help="fake model latency per call (s)")
+    parser.add_argument("--ttft", type=float, default=0.2, help="fake time to first token (s)")
+    parser.add_argument("--output-tokens", type=int, default=300)
+    parser.add_argument("--no-streaming", action="store_true")
+    parser.add_argument("--apptest", action="store_true", help="also drive app.py through streamlit AppTest")
+    parser.add_argument("--out", help="JSON output file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="hmentor-bench-")
+    try:
+        pdf_path = write_pdf(os.path.join(workdir, "synthetic.pdf"), n_pages=args.pages)
+        settings = mentor.Settings(google_api_key="fake", streaming=not args.no_streaming)
+        fake_client = FakeGeminiClient(latency=args.latency, ttft=args.ttft, output_tokens=args.output_tokens)
+        mentor_obj = mentor.create_mentor(settings, client=fake_client)
+
+        index, ingest = bench_ingest(pdf_path, workdir, settings)
+        report = {
+            "meta": {**vars(args), "python": platform.python_version(), "cpus": os.cpu_count(), "timestamp": time.time()},
+            "ingest": ingest,
+            "prompt": bench_prompt(mentor_obj, index, settings),
+            "context_cache": bench_context_cache(),
+            "download": bench_download(workdir),
+            "sessions": bench_sessions(mentor_obj, index, settings, args.sessions, args.turns, args.latency),
+        }
+        if args.apptest:
+            report["apptest"] = bench_apptest(workdir, pdf_path, fake_client, settings, min(args.sessions, 4), min(args.turns, 3))
+        report["max_rss_bytes"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+import random
+
+# Gera um PDF sintético (texto puro, fonte Helvetica) com páginas distribuídas entre os 6 cursos do programa.
+# Escrito à mão para não depender de bibliotecas de geração de PDF.
+
+COURSES = [
+    ("Marketing", "marketing marca posicionamento segmentação 4Ps produto preço praça promoção cliente campanha"),
+    ("Finanças", "ROI fluxo de caixa lucro DRE balanço margem investimento retorno orçamento custo receita"),
+    ("Negociação", "BATNA ZOPA interesses concessões acordo proposta alternativa valor impasse mediação"),
+    ("Relacionamento com o Cliente", "fidelização experiência satisfação reclamação atendimento confiança serviço retenção"),
+    ("Liderança", "equipe talentos feedback visão delegação motivação crise conflito desempenho coaching"),
+    ("Business Fundamentals", "estratégia execução decisão prioridades metas indicadores processos recursos riscos"),
+]
+
+LINES_PER_PAGE = 45
+
+
+def _escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def page_lines(page_no, n_pages, rng):
+    course_no = min(page_no * len(COURSES) // n_pages, len(COURSES) - 1)
+    title, vocabulary = COURSES[course_no]
+    words = vocabulary.split()
+    lines = [f"Módulo {course_no + 1}: {title}", f"Página {page_no + 1}"]
+    for _ in range(LINES_PER_PAGE - 2):
+        lines.append(" ".join(rng.choice(words) for _ in range(12)).capitalize() + ".")
+    return lines
+
+
+def write_pdf(path, n_pages=300, seed=42):
+    rng = random.Random(seed)
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # Pages, preenchido depois
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+    ]
+    page_ids = []
+    for page_no in range(n_pages):
+        body = "BT /F1 10 Tf 14 TL 50 800 Td " + " ".join(f"({_escape(line)}) Tj T*" for line in page_lines(page_no, n_pages, rng)) + " ET"
+        stream = body.encode("cp1252", "replace")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_id = len(objects)
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id)
+        page_ids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(b"%d 0 R" % i for i in page_ids), n_pages)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for obj_id, obj in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % obj_id + obj + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, "wb") as f:
+        f.write(out)
+    return path
@@ -0,0 +1,196 @@
+import glob
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from corpus_cache import file_lock, file_sha256
+
+
+def is_valid_pdf(path, expected_sha256=None, min_size=1024):
+    if not os.path.exists(path) or os.path.getsize(path) < min_size:
+        return False
+    with open(path, "rb") as f:
+        if f.read(5) != b"%PDF-":
+            return False
+    return not expected_sha256 or file_sha256(path) == expected_sha256.lower()
+
+
+def _download_http(url, part_path, progress=None, timeout=60):
+    # Download com retomada: continua do tamanho atual do .part via Range + If-Range. O validador (ETag ou
+    # Last-Modified) da primeira resposta fica ao lado do .part; se o arquivo remoto mudou, o servidor
+    # responde 200 com o arquivo inteiro e o .part recomeça do zero, sem misturar duas versões.
+    meta_path = part_path + ".validator"
+    done = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    validator = None
+    if done and os.path.exists(meta_path):
+        with open(meta_path) as f:
+            validator = f.read().strip() or None
+    if done and not validator:
+        done = 0  # Sem validador não há como garantir que o .part é da mesma versão
+    headers = {"Range": f"bytes={done}-", "If-Range": validator} if done else {}
+    try:
+        response = urllib.request.urlopen(urllib.request.Request(url, headers=headers), timeout=timeout)
+    except urllib.error.HTTPError as e:
+        if e.code != 416 or not done:
+            raise
+        # Range além do fim: com o validador conferindo, o .part já está completo; senão, recomeça
+        total = e.headers.get("Content-Range", "").rpartition("/")[2]
+        if total.isdigit() and int(total) == done:
+            if progress: progress(done, done)
+            return
+        os.remove(part_path)
+        return _download_http(url, part_path, progress, timeout)
+    with response:
+        if done and response.status != 206:
+            done = 0  # Servidor ignorou o Range ou o arquivo mudou: recomeça do zero
+        if not done:
+            with open(meta_path, "w") as f:
+                f.write(response.headers.get("ETag") or response.headers.get("Last-Modified") or "")
+        length = response.headers.get("Content-Length")
+        total = done + int(length) if length else None
+        with open(part_path, "ab" if done else "wb") as f:
+            for block in iter(lambda: response.read(1 << 16), b""):
+                f.write(block)
+                done += len(block)
+                if progress: progress(done, total)
+        if total is not None and done < total:
+            raise IOError(f"download interrompido em {done} de {total} bytes")  # O .part fica para a retomada
+
+
+def _remove_validator(part_path):
+    if os.path.exists(part_path + ".validator"): os.remove(part_path + ".validator")
+
+
+def _remove_partials(part_path):
+    # Descarta downloads parciais: o .part do HTTP (com o validador) e os temporários do gdown,
+    # que com resume=True ficam em "<saída><aleatório>.part" e são retomados sem conferir a versão
+    for path in [part_path] + glob.glob(glob.escape(part_path) + "*.part"):
+        if os.path.exists(path): os.remove(path)
+    _remove_validator(part_path)
+
+
+def fetch_pdf(filename, file_id=None, url=None, expected_sha256=None, progress=None):
+    # Baixa para um .part, valida (assinatura, tamanho e hash opcional) e só então renomeia de forma atômica.
+    # O lock garante que apenas um processo baixa o arquivo; os demais esperam e reaproveitam o resultado.
+    if is_valid_pdf(filename, expected_sha256): return True
+    if not (url or file_id): return False
+    os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+    part_path = filename + ".part"
+    with file_lock(filename):
+        if is_valid_pdf(filename, expected_sha256): return True
+        try:
+            if url:
+                _download_http(url, part_path, progress)
+            else:
+                import gdown
+                gdown.download(f"https://drive.google.com/uc?id={file_id}", part_path, quiet=True, resume=True)
+        except Exception:
+            return False  # O .part fica em disco para a próxima tentativa retomar
+        if not is_valid_pdf(part_path, expected_sha256):
+            os.remove(part_path)
+            _remove_validator(part_path)
+            return False
+        os.replace(part_path, filename)
+        _remove_validator(part_path)
+    return True
+
+
+def fetch_update(filename, file_id=None, url=None, expected_sha256=None, min_age=60):
+    # Baixa a versão remota ao lado do PDF atual e só a coloca no lugar se o conteúdo mudou.
+    # Com várias réplicas, a primeira a baixar atualiza o arquivo; as demais veem o arquivo recente e não baixam de novo.
+    if not (url or file_id) or not os.path.exists(filename): return False
+    next_path = filename + ".next"
+    with file_lock(filename):
+        if time.time() - os.path.getmtime(filename) < min_age: return False
+        if os.path.exists(next_path): os.remove(next_path)
+        if not url:
+            _remove_partials(next_path + ".part")  # gdown retoma sem validador: o parcial de outra verificação pode ser de outra versão
+        if not fetch_pdf(next_path, file_id, url, expected_sha256): return False
+        if file_sha256(next_path) == file_sha256(filename):
+            os.remove(next_path)
+            os.utime(filename)  # Marca a verificação, para as outras réplicas não repetirem o download agora
+            return False
+        os.replace(next_path, filename)
+    return True
+
+
+class CorpusBootstrap:
+    # Baixa o PDF e monta o índice em uma thread de fundo; a interface consulta `state` sem bloquear
+
+    def __init__(self, pdf_path, build, file_id=None, url=None, expected_sha256=None, retry_after=30, refresh_interval=0, on_update=None):
+        self.pdf_path = pdf_path
+        self.build = build
+        self.file_id = file_id
+        self.url = url
+        self.expected_sha256 = expected_sha256
+        self.retry_after = retry_after
+        # Com refresh_interval > 0, a thread continua viva procurando versões novas do PDF;
+        # on_update(índice antigo, índice novo) é chamado a cada troca (ex: para rebasear o cache de respostas)
+        self.refresh_interval = refresh_interval
+        self.on_update = on_update
+        self.version = 0
+        self.state = "pending"
+        self.progress = (0, None)
+        self.index = None
+        self.error = None
+        self._ready = threading.Event()
+        self._thread = None
+
+    @property
+    def ready(self):
+        return self._ready.is_set()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True, name="corpus-bootstrap")
+            self._thread.start()
+        return self
+
+    def wait(self, timeout=None):
+        return self._ready.wait(timeout)
+
+    def _set_progress(self, done, total):
+        self.progress = (done, total)
+
+    def _run(self):
+        while True:
+            try:
+                self.state = "downloading"
+                if not fetch_pdf(self.pdf_path, self.file_id, self.url, self.expected_sha256, self._set_progress):
+                    raise RuntimeError("PDF download failed")
+                self.state = "indexing"
+                index = self.build(self.pdf_path)
+                if index is None:
+                    raise RuntimeError("PDF extraction failed")
+                self.index = index
+                self.state = "ready"
+                self._ready.set()
+                break
+            except Exception as e:
+                self.error = str(e)
+                self.state = "failed"
+                time.sleep(self.retry_after)
+
+        while self.refresh_interval:
+            time.sleep(self.refresh_interval)
+            try:
+                self.refresh()
+            except Exception as e:
+                self.error = str(e)  # Continua servindo a versão atual; tenta de novo no próximo ciclo
+
+    def refresh(self):
+        # Troca o corpus sem reiniciar o processo. As sessões pegam o índice novo no próximo rerun;
+        # as que estão no meio de uma resposta terminam com o antigo, que continua mapeado.
+        fetch_update(self.pdf_path, self.file_id, self.url, self.expected_sha256, min_age=self.refresh_interval / 2)
+        if file_sha256(self.pdf_path) == self.index.meta["pdf_sha256"]:
+            return False
+        index = self.build(self.pdf_path)
+        if index is None:
+            raise RuntimeError("PDF extraction failed")
+        previous, self.index = self.index, index
+        self.version += 1
+        self.error = None
+        if self.on_update: self.on_update(previous, index)
+        return True
@@ -0,0 +1,112 @@
+import hashlib
+import threading
+import time
+
+from google.genai import types
+
+from retrieval import estimate_tokens
+
+# Tamanho mínimo (tokens) aceito pelo Gemini para um cache explícito; abaixo disso `caches.create` sempre falha
+MIN_CACHE_TOKENS = {"gemini-2.5-flash": 1024, "gemini-2.5-flash-lite": 1024, "gemini-2.5-pro": 4096}
+
+
+class ContextCacheManager:
+    # Mantém um cached content do Gemini por prompt de sistema (modo, idioma e hash do texto), compartilhado
+    # entre turnos e sessões. Renova o TTL antes de expirar e, se o cache não estiver disponível, devolve None
+    # (prompt inline). Prompts abaixo do mínimo do modelo nunca chegam à API; como os prompts atuais são
+    # todos menores que isso, o cache fica desligado por padrão (CONTEXT_CACHE=false).
+    # As chamadas de rede acontecem fora do lock: enquanto um turno cria ou renova um cache, os demais seguem
+    # com o cache atual (se ainda válido) ou com o prompt inline, sem esperar.
+
+    def __init__(self, client, model, ttl_seconds=3600, refresh_margin=300, retry_after=600, min_tokens=None, clock=time.time):
+        self.client = client
+        self.model = model
+        self.ttl_seconds = ttl_seconds
+        self.refresh_margin = refresh_margin
+        self.retry_after = retry_after
+        self.min_tokens = MIN_CACHE_TOKENS.get(model, 4096) if min_tokens is None else min_tokens
+        self.clock = clock
+        self._ids = {}
+        self._entries = {}
+        self._unavailable_until = {}
+        self._busy = set()
+        self._lock = threading.Lock()
+
+    def display_name(self, key, system_instruction):
+        digest = hashlib.sha256(f"{self.model}\n{system_instruction}".encode("utf-8")).hexdigest()[:16]
+        return "hmentor-" + "-".join(key) + "-" + digest
+
+    def _cache_id(self, key, system_instruction):
+        # Calculado uma vez por texto de prompt; "" marca prompts pequenos demais para o cache explícito
+        cache_id = self._ids.get(system_instruction)
+        if cache_id is None:
+            cache_id = self.display_name(key, system_instruction) if estimate_tokens(system_instruction) >= self.min_tokens else ""
+            self._ids[system_instruction] = cache_id
+        return cache_id
+
+    def get(self, key, system_instruction):
+        cache_id = self._cache_id(key, system_instruction)
+        if not cache_id:
+            return None
+        now = self.clock()
+        with self._lock:
+            if self._unavailable_until.get(cache_id, 0) > now:
+                return None
+            entry = self._entries.get(cache_id)
+            if entry and entry[1] - now > self.refresh_margin:
+                return entry[0]
+            if cache_id in self._busy:
+                return entry[0] if entry and entry[1] > now else None
+            self._busy.add(cache_id)
+        try:
+            name = self._refresh(cache_id, entry[0], now) if entry and entry[1] > now else None
+            return name or self._find_existing(cache_id, now) or self._create(cache_id, system_instruction, now)
+        except Exception:
+            # Ex: cota, modelo sem suporte a cache ou falha de rede
+            with self._lock:
+                self._entries.pop(cache_id, None)
+                self._unavailable_until[cache_id] = now + self.retry_after
+            return None
+        finally:
+            with self._lock:
+                self._busy.discard(cache_id)
+
+    def invalidate(self, key):
+        prefix = "hmentor-" + "-".join(key) + "-"
+        with self._lock:
+            for cache_id in [cache_id for cache_id in self._entries if cache_id.startswith(prefix)]:
+                del self._entries[cache_id]
+
+    def _expires_at(self, cached, now):
+        expire_time = getattr(cached, "expire_time", None)
+        return expire_time.timestamp() if expire_time else now + self.ttl_seconds
+
+    def _store(self, cache_id, cached, now):
+        with self._lock:
+            self._entries[cache_id] = (cached.name, self._expires_at(cached, now))
+        return cached.name
+
+    def _refresh(self, cache_id, name, now):
+        try:
+            cached = self.client.caches.update(name=name, config=types.UpdateCachedContentConfig(ttl=f"{self.ttl_seconds}s"))
+        except Exception:
+            return None
+        return self._store(cache_id, cached, now)
+
+    def _find_existing(self, cache_id, now):
+        # Reaproveita caches criados por outros processos/réplicas com o mesmo prompt
+        for cached in self.client.caches.list():
+            if cached.display_name == cache_id and self._expires_at(cached, now) - now > self.refresh_margin:
+                return self._store(cache_id, cached, now)
+        return None
+
+    def _create(self, cache_id, system_instruction, now):
+        cached = self.client.caches.create(
+            model=self.model,
+            config=types.CreateCachedContentConfig(
+                display_name=cache_id,
+                system_instruction=system_instruction,
+                ttl=f"{self.ttl_seconds}s",
+            ),
+        )
+        return self._store(cache_id, cached, now)
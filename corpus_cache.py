@@ -0,0 +1,185 @@
+import fcntl
+import hashlib
+import json
+import mmap
+import os
+import struct
+import tempfile
+from contextlib import contextmanager
+from multiprocessing import resource_tracker, shared_memory
+
+from retrieval import BM25Index
+
+# Artefato binário: MAGIC | tamanho do cabeçalho (uint32) | cabeçalho JSON | seções alinhadas em 8 bytes.
+# FORMAT_VERSION entra no nome do arquivo: artefatos de formatos antigos são ignorados e refeitos.
+MAGIC = b"HMC2"
+FORMAT_VERSION = 2
+ARRAY_FIELDS = ("page_offsets", "chunk_pages", "chunk_starts", "chunk_ends", "term_offsets", "doc_lens", "post_offsets", "post_docs", "post_tfs")
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def artifact_path(cache_dir, pdf_hash, extractor_version, chunk_size):
+    return os.path.join(cache_dir, f"{pdf_hash[:32]}-f{FORMAT_VERSION}-x{extractor_version}-c{chunk_size}.hmc")
+
+
+@contextmanager
+def file_lock(path):
+    # Evita que dois processos (ou réplicas no mesmo volume) construam o mesmo artefato ao mesmo tempo
+    with open(path + ".lock", "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def save_index(index, path, meta):
+    sections = [("text", bytes(index.data)), ("terms", bytes(index.term_data))]
+    sections += [(name, getattr(index, name).tobytes()) for name in ARRAY_FIELDS]
+
+    layout, offset = {}, 0
+    for name, payload in sections:
+        layout[name] = [offset, len(payload)]
+        offset += len(payload) + (-len(payload) % 8)
+    header = json.dumps({**meta, "k1": index.k1, "b": index.b, "sections": layout}).encode("utf-8")
+    header += b" " * (-(len(MAGIC) + 4 + len(header)) % 8)
+
+    # Escrita atômica: um leitor nunca enxerga um artefato pela metade
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(MAGIC + struct.pack("<I", len(header)) + header)
+            for _, payload in sections:
+                f.write(payload + b"\0" * (-len(payload) % 8))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path): os.remove(tmp_path)
+        raise
+
+
+def open_index(buffer):
+    # Monta o índice diretamente sobre o buffer (mmap ou memória compartilhada), sem copiar as seções
+    view = memoryview(buffer)
+    if bytes(view[:4]) != MAGIC:
+        raise ValueError("invalid corpus artifact")
+    (header_len,) = struct.unpack("<I", view[4:8])
+    header = json.loads(bytes(view[8:8 + header_len]))
+    base = 8 + header_len
+
+    def section(name):
+        start, length = header["sections"][name]
+        return view[base + start:base + start + length]
+
+    arrays = {name: section(name).cast("I") for name in ARRAY_FIELDS}
+    index = BM25Index(section("text"), term_data=section("terms"), k1=header["k1"], b=header["b"], **arrays)
+    index.meta = header
+    return index
+
+
+def load_index(path):
+    with open(path, "rb") as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return open_index(buffer)
+
+
+def publish_shared(path, name):
+    # Copia o artefato para um segmento de memória compartilhada, criado uma vez pelo launcher
+    size = os.path.getsize(path)
+    shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+    try:
+        with open(path, "rb") as f, shm.buf[:size] as view:
+            f.readinto(view)
+    except BaseException:
+        shm.close()
+        shm.unlink()
+        raise
+    return shm
+
+
+def attach_shared(name):
+    # Cada worker anexa o segmento sem copiar; o índice mantém a referência para o buffer continuar válido
+    shm = shared_memory.SharedMemory(name=name)
+    # Sem isso, o resource_tracker do worker apagaria o segmento quando o processo terminasse
+    resource_tracker.unregister(shm._name, "shared_memory")
+    index = open_index(shm.buf)
+    index.shm = shm
+    return index
+
+
+def previous_artifact(cache_dir, extractor_version, chunk_size, exclude=None):
+    # Artefato mais recente da mesma versão do extrator: base para reaproveitar as páginas que não mudaram
+    suffix = f"-f{FORMAT_VERSION}-x{extractor_version}-c{chunk_size}.hmc"
+    candidates = [os.path.join(cache_dir, name) for name in os.listdir(cache_dir) if name.endswith(suffix)]
+    candidates = [path for path in candidates if path != exclude and os.path.exists(path)]
+    try: return max(candidates, key=os.path.getmtime, default=None)
+    except FileNotFoundError: return None  # Removido por prune_artifacts no meio da listagem
+
+
+def prune_artifacts(cache_dir, extractor_version, chunk_size, keep):
+    # Remove artefatos da mesma configuração que não estão em `keep`: basta o atual e a versão anterior, base da
+    # reextração incremental. Processos que ainda mapeiam um arquivo removido seguem lendo normalmente.
+    # Os .lock ficam: apagar um lock que outro processo segura faria o próximo abrir outro inode e construir em paralelo
+    suffix = f"-f{FORMAT_VERSION}-x{extractor_version}-c{chunk_size}.hmc"
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        if name.endswith(suffix) and path not in keep:
+            try: os.remove(path)
+            except OSError: pass  # Outro processo já removeu
+
+
+def known_pages(index):
+    # hash de página -> texto, a partir de um artefato que registrou os hashes (page_hashes)
+    hashes = index.meta.get("page_hashes") or []
+    if len(hashes) != index.page_count or len(set(hashes)) != len(hashes):
+        return {}
+    return {digest: index.page_text(page_no).removesuffix("\n") for page_no, digest in enumerate(hashes, start=1)}
+
+
+def page_mapping(old_meta, new_meta):
+    # Página antiga -> página nova, para as páginas cujo conteúdo não mudou (mesmo que tenham mudado de posição)
+    old_hashes, new_hashes = old_meta.get("page_hashes") or [], new_meta.get("page_hashes") or []
+    # Hashes repetidos em qualquer das versões não identificam a página: nenhuma resposta é mantida
+    if len(set(old_hashes)) != len(old_hashes) or len(set(new_hashes)) != len(new_hashes):
+        return {}
+    new_pages = {digest: page_no for page_no, digest in enumerate(new_hashes, start=1)}
+    return {page_no: new_pages[digest] for page_no, digest in enumerate(old_hashes, start=1) if digest in new_pages}
+
+
+def load_or_build_index(pdf_path, cache_dir, extractor_version, chunk_size, extract, annotate=None):
+    # `extract(pdf_path, previous)` devolve (texto, metadados); `previous` é o índice da versão anterior do PDF, se houver.
+    # `annotate(pdf_path, index)` devolve metadados extras gravados no cabeçalho (ex: seções por curso)
+    pdf_hash = file_sha256(pdf_path)
+    path = artifact_path(cache_dir, pdf_hash, extractor_version, chunk_size)
+    if os.path.exists(path):
+        try: return load_index(path)
+        except FileNotFoundError: pass  # Removido por prune_artifacts de outro processo: reconstrói com o lock
+
+    os.makedirs(cache_dir, exist_ok=True)
+    with file_lock(path):
+        # Outro processo pode ter concluído a extração enquanto esperávamos o lock
+        if os.path.exists(path):
+            try: return load_index(path)
+            except FileNotFoundError: pass
+        previous = None
+        previous_path = previous_artifact(cache_dir, extractor_version, chunk_size, exclude=path)
+        if previous_path:
+            try: previous = load_index(previous_path)
+            except (OSError, ValueError): pass
+        text, extra = extract(pdf_path, previous)
+        if not text: return None
+        index = BM25Index.build(text, chunk_size=chunk_size)
+        meta = {"pdf_sha256": pdf_hash, "extractor_version": extractor_version, "chunk_size": chunk_size, **extra}
+        if annotate: meta.update(annotate(pdf_path, index))
+        save_index(index, path, meta)
+        prune_artifacts(cache_dir, extractor_version, chunk_size, keep={path, previous_path})
+        return load_index(path)
@@ -0,0 +1,189 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from gemini_client import GeminiError
+from history import new_history_state
+from mentor import Settings, build_retrieval_index, create_mentor, read_secret, retrieve_context
+from metrics import FIELDS, percentile
+from prompts import PROMPTS
+
+# Avaliação headless: roda um arquivo JSONL de casos (mode, lang, history) contra o mesmo pipeline do app
+# (recuperação + prompt + Gemini), sem Streamlit. Cada resultado é gravado assim que fica pronto, então
+# uma execução interrompida continua de onde parou ao rodar de novo com o mesmo --out.
+#   python evaluate.py casos.jsonl --out resultados.jsonl --concurrency 8 --rate 2
+#   python evaluate.py benchmarks/eval_cases.jsonl --out /tmp/r.jsonl --stub --synthetic-pages 120
+
+PDF_PATH = "Harvard Manager Mentor.pdf"
+
+
+def case_id(case):
+    # Casos sem "id" são identificados pelo conteúdo, para o resume não depender da ordem das linhas
+    if case.get("id"):
+        return str(case["id"])
+    payload = json.dumps([case["mode"], case["lang"], case["history"]], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def load_cases(path):
+    cases = []
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            case = json.loads(line)
+            # Atalho: {"question": "..."} vira um histórico de uma única mensagem
+            if "history" not in case:
+                case["history"] = [{"role": "user", "content": case.pop("question")}]
+            case.setdefault("mode", "Consultor")
+            case.setdefault("lang", "pt")
+            if (case["mode"], case["lang"]) not in PROMPTS:
+                modes = sorted({mode for mode, _ in PROMPTS})
+                langs = sorted({lang for _, lang in PROMPTS})
+                raise ValueError(f"{path}:{line_no}: unknown mode/lang {case['mode']!r}/{case['lang']!r} (modes: {modes}, langs: {langs})")
+            if not case["history"] or case["history"][-1]["role"] != "user":
+                raise ValueError(f"{path}:{line_no}: history must end with a user message")
+            case["id"] = case_id(case)
+            cases.append(case)
+    return cases
+
+
+def completed_ids(out_path):
+    # Só casos concluídos sem erro são pulados; os que falharam são tentados de novo
+    done = set()
+    if not os.path.exists(out_path):
+        return done
+    with open(out_path, encoding="utf-8") as f:
+        for line in f:
+            try: result = json.loads(line)
+            except ValueError: continue  # Linha cortada por uma interrupção no meio da escrita
+            if not result.get("error"):
+                done.add(result["id"])
+    return done
+
+
+class RateLimiter:
+    # Espaça o início das chamadas para no máximo `rate` por segundo (0 desativa)
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        if not self.interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+def run_case(mentor_obj, index, settings, case):
+    history = case["history"]
+    result = {"id": case["id"], "mode": case["mode"], "lang": case["lang"], "question": history[-1]["content"], "answer": None, "error": None}
+    stats = {}
+    start = time.perf_counter()
+    # Qualquer falha fica registrada no próprio caso; o restante da execução continua
+    try:
+        context_text, stats = retrieve_context(index, history, case["mode"], settings.retrieval_top_k)
+        result["answer"] = mentor_obj.get_gemini_response(history, case["mode"], case["lang"], context_text, new_history_state(), stats=stats)
+    except GeminiError as e:
+        result["error"] = str(e.status or e)
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    stats["total_time"] = time.perf_counter() - start
+    mentor_obj.metrics.record("eval", case["mode"], case["lang"], stats, error=result["error"])
+    result.update({field: stats.get(field) for field in FIELDS if field != "ttft"})
+    if stats.get("courses"): result["courses"] = stats["courses"]
+    return result
+
+
+async def run_all(mentor_obj, index, settings, cases, out_path, concurrency, rate):
+    loop = asyncio.get_running_loop()
+    limiter = RateLimiter(rate)
+    semaphore = asyncio.Semaphore(concurrency)
+    results = []
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool, open(out_path, "a", encoding="utf-8") as out:
+        async def worker(case):
+            async with semaphore:
+                await limiter.wait()
+                result = await loop.run_in_executor(pool, run_case, mentor_obj, index, settings, case)
+            # Gravado no loop principal, uma linha por vez: o checkpoint nunca mistura dois resultados
+            out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            out.flush()
+            results.append(result)
+            print(f"[{len(results)}/{len(cases)}] {case['mode']}/{case['lang']} {result['id']} {'ERRO ' + result['error'] if result['error'] else 'ok'} ({result['total_time']:.2f}s)", file=sys.stderr)
+
+        await asyncio.gather(*(worker(case) for case in cases))
+    return results
+
+
+def summarize(results, skipped):
+    latencies = [r["total_time"] for r in results if not r["error"]]
+    summary = {"cases": len(results) + skipped, "run": len(results), "skipped": skipped, "errors": sum(1 for r in results if r["error"])}
+    if latencies:
+        summary.update({"latency_p50": percentile(latencies, 50), "latency_p95": percentile(latencies, 95), "latency_max": max(latencies)})
+    for field in ("prompt_tokens", "cached_tokens", "context_tokens", "output_tokens", "retries"):
+        summary[field] = sum(r.get(field) or 0 for r in results)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Avaliação headless do Harvard Mentor AI sobre um conjunto de casos JSONL")
+    parser.add_argument("cases", help="arquivo JSONL com mode, lang e history (ou question) por linha")
+    parser.add_argument("--out", required=True, help="JSONL de resultados; também serve de checkpoint para retomar")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=0, help="máximo de casos iniciados por segundo (0 = sem limite)")
+    parser.add_argument("--pdf", default=PDF_PATH)
+    parser.add_argument("--stub", action="store_true", help="usa o Gemini falso de benchmarks/ (sem rede, sem chave)")
+    parser.add_argument("--stub-latency", type=float, default=0.2)
+    parser.add_argument("--synthetic-pages", type=int, default=0, help="com --stub, indexa um PDF sintético no lugar do real")
+    args = parser.parse_args(argv)
+
+    settings = Settings.from_source(read_secret)
+    settings.streaming = False
+    settings.gemini_max_concurrency = max(settings.gemini_max_concurrency, args.concurrency)
+    try:
+        cases = load_cases(args.cases)
+    except (ValueError, KeyError) as e:
+        sys.exit(f"Caso inválido: {e}")
+    done = completed_ids(args.out)
+    pending = [case for case in cases if case["id"] not in done]
+    print(f"{len(cases)} casos, {len(cases) - len(pending)} já concluídos em {args.out}", file=sys.stderr)
+
+    client, workdir = None, None
+    try:
+        if args.stub:
+            from benchmarks.fake_gemini import FakeGeminiClient
+            client = FakeGeminiClient(latency=args.stub_latency, ttft=0)
+            if args.synthetic_pages:
+                from benchmarks.synthetic_pdf import write_pdf
+                workdir = tempfile.mkdtemp(prefix="hmentor-eval-")
+                args.pdf = write_pdf(os.path.join(workdir, "synthetic.pdf"), n_pages=args.synthetic_pages)
+                settings.corpus_cache_dir = os.path.join(workdir, "cache")
+
+        index = build_retrieval_index(args.pdf, settings)
+        if index is None:
+            sys.exit("Não foi possível baixar ou indexar o PDF.")
+        mentor_obj = create_mentor(settings, client=client)
+
+        results = asyncio.run(run_all(mentor_obj, index, settings, pending, args.out, args.concurrency, args.rate))
+    finally:
+        if workdir: shutil.rmtree(workdir, ignore_errors=True)
+    print(json.dumps(summarize(results, len(cases) - len(pending)), indent=2))
+    return 1 if any(r["error"] for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
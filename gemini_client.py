@@ -0,0 +1,111 @@
+import random
+import threading
+import time
+
+import httpx
+from google import genai
+from google.genai import errors, types
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+class GeminiError(Exception):
+    # Erro estruturado: a interface decide a mensagem com base em `retryable` e `status`
+
+    def __init__(self, message, status=None, retryable=False, attempts=1):
+        super().__init__(message)
+        self.status = status
+        self.retryable = retryable
+        self.attempts = attempts
+
+
+def create_client(api_key, timeout_s=60, max_connections=20):
+    # Um único httpx.Client por processo: pool de conexões com keep-alive, sem novo handshake TLS a cada turno
+    limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections, keepalive_expiry=120)
+    return genai.Client(
+        api_key=api_key,
+        http_options=types.HttpOptions(timeout=int(timeout_s * 1000), client_args={"limits": limits}),
+    )
+
+
+def usage_stats(usage):
+    return {
+        "prompt_tokens": usage.prompt_token_count or 0,
+        "cached_tokens": usage.cached_content_token_count or 0,
+        "output_tokens": usage.candidates_token_count or 0,
+    }
+
+
+def classify(exc):
+    if isinstance(exc, GeminiError):
+        return exc
+    if isinstance(exc, errors.APIError):
+        return GeminiError(str(exc), status=exc.code, retryable=exc.code in RETRYABLE_STATUS)
+    if isinstance(exc, (httpx.TimeoutException, httpx.TransportError)):
+        return GeminiError(str(exc) or type(exc).__name__, retryable=True)
+    return GeminiError(str(exc))
+
+
+class GeminiGateway:
+    # Envolve o client compartilhado com limite de concorrência e retries com backoff exponencial e jitter
+
+    def __init__(self, client, max_concurrency=8, max_retries=3, base_delay=1.0, max_delay=20.0, queue_timeout=30.0, sleep=time.sleep):
+        self.client = client
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.queue_timeout = queue_timeout
+        self.sleep = sleep
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+
+    def backoff(self, attempt):
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def _acquire(self):
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            raise GeminiError("too many concurrent requests", status=429, retryable=True)
+
+    def generate(self, stats=None, **request):
+        self._acquire()
+        try:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    response = self.client.models.generate_content(**request)
+                    if stats is not None:
+                        stats["retries"] = attempt
+                        if getattr(response, "usage_metadata", None): stats.update(usage_stats(response.usage_metadata))
+                    return response
+                except Exception as exc:
+                    error = classify(exc)
+                    error.attempts = attempt + 1
+                    if stats is not None: stats["retries"] = attempt
+                    if not error.retryable or attempt == self.max_retries:
+                        raise error from exc
+                    self.sleep(self.backoff(attempt))
+        finally:
+            self._slots.release()
+
+    def stream(self, stats=None, **request):
+        # Só repete a chamada enquanto nenhum trecho foi entregue, para não duplicar texto na tela
+        self._acquire()
+        try:
+            for attempt in range(self.max_retries + 1):
+                started = False
+                try:
+                    for chunk in self.client.models.generate_content_stream(**request):
+                        if stats is not None:
+                            stats["retries"] = attempt
+                            # Em streaming, o uso de tokens chega nos metadados dos últimos trechos
+                            if getattr(chunk, "usage_metadata", None): stats.update(usage_stats(chunk.usage_metadata))
+                        started = True
+                        yield chunk
+                    return
+                except Exception as exc:
+                    error = classify(exc)
+                    error.attempts = attempt + 1
+                    if stats is not None: stats["retries"] = attempt
+                    if started or not error.retryable or attempt == self.max_retries:
+                        raise error from exc
+                    self.sleep(self.backoff(attempt))
+        finally:
+            self._slots.release()
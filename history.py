@@ -0,0 +1,81 @@
+import re
+
+from retrieval import estimate_tokens
+
+_ALTERNATIVE_RE = re.compile(r"(?m)^\s*[\*\(]*[A-D][\)\.:]")
+_INCORRECT_RE = re.compile(r"\b(INCORRETO|INCORRECT)\b")
+_CORRECT_RE = re.compile(r"\b(CORRETO|CORRECT)\b")
+
+
+def new_history_state():
+    return {"summary": "", "upto": 0}
+
+
+def quiz_state(messages):
+    # Placar e pergunta atual do Quiz, extraídos das respostas do professor
+    correct = wrong = 0
+    question = None
+    for msg in messages:
+        if msg["role"] != "assistant":
+            continue
+        if _INCORRECT_RE.search(msg["content"]): wrong += 1
+        elif _CORRECT_RE.search(msg["content"]): correct += 1
+        if len(_ALTERNATIVE_RE.findall(msg["content"])) >= 3:
+            question = msg["content"]
+    return correct, wrong, question
+
+
+def extractive_summary(previous, messages, max_chars=1200):
+    # Resumo de emergência quando o modelo não consegue resumir: mantém o começo de cada mensagem
+    lines = [previous] if previous else []
+    lines += [f"{msg['role']}: {' '.join(msg['content'].split())[:200]}" for msg in messages]
+    return "\n".join(lines)[-max_chars:]
+
+
+class HistoryManager:
+    # Mantém as últimas `keep_turns` trocas literais e acumula as anteriores em um resumo incremental:
+    # o resumo só é refeito quando `summarize_every` trocas novas saem da janela, sempre a partir do resumo anterior.
+
+    def __init__(self, summarize, keep_turns=6, token_budget=4000, summarize_every=2):
+        self.summarize = summarize
+        self.keep_turns = keep_turns
+        self.token_budget = token_budget
+        self.summarize_every = summarize_every
+
+    def _cutoff(self, messages, state):
+        keep = self.keep_turns * 2 + 1
+        if len(messages) - state["upto"] <= keep + self.summarize_every * 2:
+            cutoff = state["upto"]
+        else:
+            cutoff = len(messages) - keep
+        # Se ainda estourar o orçamento, aperta a janela (mantendo ao menos a última pergunta)
+        while cutoff < len(messages) - 1 and sum(estimate_tokens(m["content"]) for m in messages[cutoff:]) > self.token_budget:
+            cutoff += 2
+        # A janela literal sempre começa por uma mensagem do usuário
+        while cutoff < len(messages) - 1 and messages[cutoff]["role"] != "user":
+            cutoff += 1
+        return min(cutoff, len(messages) - 1)
+
+    def compact(self, messages, state, mode, lang):
+        # Retorna (mensagens literais, bloco de memória a ser enviado antes delas)
+        if state["upto"] > len(messages):
+            state.update(new_history_state())
+        cutoff = self._cutoff(messages, state)
+        if cutoff > state["upto"]:
+            evicted = messages[state["upto"]:cutoff]
+            try:
+                state["summary"] = self.summarize(state["summary"], evicted, lang)
+            except Exception:
+                state["summary"] = extractive_summary(state["summary"], evicted)
+            state["upto"] = cutoff
+
+        memory = state["summary"] if cutoff else ""
+        if mode == "Quiz" and cutoff:
+            correct, wrong, question = quiz_state(messages)
+            if lang == "pt":
+                memory += f"\n\nPLACAR DO QUIZ: {correct} corretas, {wrong} incorretas."
+            else:
+                memory += f"\n\nQUIZ SCORE: {correct} correct, {wrong} incorrect."
+            if question and question not in (m["content"] for m in messages[cutoff:]):
+                memory += ("\nPERGUNTA ATUAL:\n" if lang == "pt" else "\nCURRENT QUESTION:\n") + question
+        return messages[cutoff:], memory.strip()
@@ -0,0 +1,226 @@
+import os
+import time
+from dataclasses import dataclass, fields
+
+from google.genai import types
+
+from bootstrap import fetch_pdf
+from context_cache import ContextCacheManager
+from corpus_cache import attach_shared, file_sha256, known_pages, load_or_build_index
+from gemini_client import GeminiError, GeminiGateway, create_client
+from history import HistoryManager, new_history_state
+from metrics import MetricsRegistry
+from pdf_extract import EXTRACTOR_VERSION, extract_incremental, extract_text
+from prompts import context_part, memory_part, summary_prompt, system_prompt
+from retrieval import estimate_tokens, format_passages, normalize
+from sections import detect_sections, route_courses, section_for_page
+
+# Núcleo do mentor sem Streamlit: usado pelo app, pelos benchmarks e por execuções headless
+
+GEMINI_MODEL = "gemini-2.5-flash"
+
+
+@dataclass
+class Settings:
+    # Cada campo é lido pelo nome em maiúsculas (ex: RETRIEVAL_TOP_K) de st.secrets ou de variáveis de ambiente
+    google_api_key: str = None
+    gdrive_file_id: str = None
+    pdf_url: str = None
+    pdf_sha256: str = None
+    retrieval_top_k: int = 6
+    retrieval_chunk_size: int = 300
+    corpus_cache_dir: str = ".corpus_cache"
+    pdf_backend: str = "auto"
+    pdf_workers: int = os.cpu_count() or 1
+    streaming: bool = True
+    context_cache: bool = False  # Os prompts atuais ficam abaixo do mínimo do cache explícito (ver context_cache.py)
+    context_cache_ttl: int = 3600
+    gemini_timeout: float = 60
+    gemini_max_retries: int = 3
+    gemini_max_concurrency: int = 8
+    response_cache: bool = True
+    response_cache_size: int = 512
+    response_cache_ttl: int = 86400
+    response_cache_similarity: float = 0.85
+    history_keep_turns: int = 6
+    history_token_budget: int = 4000
+    metrics_jsonl: str = None
+    metrics_port: int = 0
+    admin_panel: bool = False
+    corpus_shm: str = None
+    corpus_refresh_interval: int = 0
+
+    @classmethod
+    def from_source(cls, get):
+        values = {}
+        for field in fields(cls):
+            raw = get(field.name.upper())
+            if raw is None or raw == "":
+                continue
+            values[field.name] = str(raw).lower() == "true" if field.type is bool else field.type(raw)
+        return cls(**values)
+
+
+def read_secret(key):
+    # Mesmas chaves do app para execuções fora do Streamlit; sem secrets.toml, valem só as variáveis de ambiente
+    try:
+        import streamlit as st
+        return st.secrets.get(key, os.environ.get(key))
+    except Exception: return os.environ.get(key)
+
+
+def download_pdf_if_needed(filename, file_id, url=None, expected_sha256=None):
+    return fetch_pdf(filename, file_id=file_id, url=url, expected_sha256=expected_sha256)
+
+
+def load_pdf_text(pdf_path, file_id=None, backend="auto", workers=None):
+    if not download_pdf_if_needed(pdf_path, file_id): return None
+    try:
+        return extract_text(pdf_path, backend=backend, workers=workers)
+    except: return None
+
+
+def build_retrieval_index(pdf_path, settings):
+    # Texto, offsets de página e índice vêm do artefato em disco (mmap); só extrai se o hash do PDF mudar.
+    # Sob o serve.py, o artefato já está publicado em memória compartilhada e o worker só anexa o segmento.
+    if settings.corpus_shm:
+        try:
+            index = attach_shared(settings.corpus_shm)
+            # Depois de uma atualização do PDF o segmento fica para trás e o worker passa para o artefato novo
+            if not os.path.exists(pdf_path) or index.meta["pdf_sha256"] == file_sha256(pdf_path):
+                return index
+        except Exception: pass  # Segmento ausente: cai no artefato em disco, que também é mapeado sem cópia
+    if not download_pdf_if_needed(pdf_path, settings.gdrive_file_id, settings.pdf_url, settings.pdf_sha256): return None
+
+    def extract(path, previous):
+        # Páginas com o mesmo hash de conteúdo da versão anterior reaproveitam o texto já extraído
+        text, hashes, changed = extract_incremental(path, known_pages(previous) if previous else None, settings.pdf_backend, settings.pdf_workers)
+        return text, {"page_hashes": hashes, "changed_pages": changed, "previous_sha256": previous.meta["pdf_sha256"] if previous else None}
+
+    try:
+        return load_or_build_index(pdf_path, settings.corpus_cache_dir, f"{EXTRACTOR_VERSION}-{settings.pdf_backend}", settings.retrieval_chunk_size, extract, annotate=lambda path, index: {"course_sections": detect_sections(path, index)})
+    except Exception: return None
+
+
+# Termos extras por modo para orientar a busca quando a mensagem é curta (ex: "B" no Quiz)
+MODE_HINTS = {
+    "Consultor": "",
+    "Quiz": "caso",
+    "Roleplay": "negociação BATNA interesses escuta ativa",
+}
+
+
+def retrieve_context(index, chat_history, mode, top_k):
+    user_msgs = [m["content"] for m in chat_history if m["role"] == "user"]
+    query = user_msgs[-1] if user_msgs else ""
+    # Respostas curtas dependem da pergunta anterior do modelo (ex: alternativa do Quiz)
+    if len(query.split()) < 4 and len(chat_history) > 1:
+        query = chat_history[-2]["content"] + " " + query
+    query += " " + MODE_HINTS.get(mode, "")
+
+    # Busca só nos cursos do tema da conversa (a primeira pergunta define o assunto do Quiz/Roleplay).
+    # O roteamento usa só o que o usuário escreveu: as dicas de modo puxariam sempre os mesmos cursos
+    sections = getattr(index, "meta", {}).get("course_sections") or []
+    route_text = " ".join(dict.fromkeys(user_msgs[:1] + user_msgs[-1:]))
+    courses = route_courses(route_text, mode) if sections else []
+    doc_ranges = [(s["chunk_start"], s["chunk_end"]) for s in sections if s["course"] in courses]
+    passages = index.passages(query, k=top_k, doc_ranges=doc_ranges)
+    if doc_ranges and not passages:
+        passages = index.passages(query, k=top_k)
+
+    context_text = format_passages(passages, label=lambda page: citation(sections, page))
+    context_tokens = estimate_tokens(context_text)
+    stats = {"context_tokens": context_tokens, "tokens_saved": max(index.total_tokens - context_tokens, 0)}
+    if doc_ranges: stats["courses"] = courses
+    # Páginas usadas na resposta: numa atualização do PDF, só respostas com páginas alteradas saem do cache
+    stats["pages"] = sorted({page for page, _ in passages})
+    return context_text, stats
+
+
+def citation(sections, page):
+    section = section_for_page(sections, page)
+    if section is None:
+        return f"p. {page}"
+    # Títulos de capítulo ganham o curso como prefixo; títulos que já citam o curso ficam como estão
+    if normalize(section["course"]) in normalize(section["title"]):
+        return f"{section['title']}, p. {page}"
+    return f"{section['course']} › {section['title']}, p. {page}"
+
+
+class Mentor:
+    # Monta os pedidos ao Gemini (prompt, histórico compactado, contexto recuperado) e registra as métricas
+
+    def __init__(self, settings, gateway, metrics=None, context_cache=None):
+        self.settings = settings
+        self.gateway = gateway
+        self.metrics = metrics or MetricsRegistry()
+        self.context_cache = context_cache
+        self.history = HistoryManager(self.summarize_history, keep_turns=settings.history_keep_turns, token_budget=settings.history_token_budget)
+
+    def summarize_history(self, previous_summary, messages, lang):
+        transcript = "\n".join(f"{msg['role'].upper()}: {msg['content']}" for msg in messages)
+        prompt = summary_prompt(previous_summary, transcript, lang)
+        config = types.GenerateContentConfig(temperature=0.2, max_output_tokens=400, thinking_config=types.ThinkingConfig(thinking_budget=0))
+        stats, start = {}, time.perf_counter()
+        try:
+            return self.gateway.generate(stats=stats, model=GEMINI_MODEL, contents=prompt, config=config).text.strip()
+        except GeminiError as e:
+            stats["error"] = str(e.status or "error")
+            raise
+        finally:
+            stats["total_time"] = time.perf_counter() - start
+            self.metrics.record("summary", "-", lang, stats, error=stats.get("error"))
+
+    def build_gemini_request(self, chat_history, mode, lang, context_text, history_state=None):
+        system_instruction = system_prompt(mode, lang)
+
+        # Janela literal das últimas trocas + resumo incremental das anteriores (guardado na sessão)
+        if history_state is None:
+            history_state = new_history_state()
+        recent, memory = self.history.compact(chat_history, history_state, mode, lang)
+
+        contents = []
+        for msg in recent:
+            role = "user" if msg["role"] == "user" else "model"
+            contents.append(types.Content(role=role, parts=[types.Part.from_text(text=msg["content"])]))
+
+        if memory and contents:
+            contents[0].parts.insert(0, types.Part.from_text(text=memory_part(memory, lang)))
+
+        # O material recuperado vai junto da última pergunta, fora do prompt de sistema, que fica em cache no servidor
+        if context_text and contents:
+            contents[-1].parts.insert(0, types.Part.from_text(text=context_part(context_text, lang)))
+
+        cache_name = self.context_cache.get((mode, lang), system_instruction) if self.context_cache else None
+        if cache_name:
+            config = types.GenerateContentConfig(temperature=0.5, top_p=0.95, cached_content=cache_name)
+        else:
+            config = types.GenerateContentConfig(temperature=0.5, top_p=0.95, system_instruction=system_instruction)
+        return contents, config
+
+    def get_gemini_response(self, chat_history, mode, lang, context_text, history_state=None, stats=None):
+        # Lança GeminiError (com `retryable`) em caso de falha, após os retries
+        contents, config = self.build_gemini_request(chat_history, mode, lang, context_text, history_state)
+        response = self.gateway.generate(stats=stats, model=GEMINI_MODEL, contents=contents, config=config)
+        return response.text
+
+    def stream_gemini_response(self, chat_history, mode, lang, context_text, history_state, timings):
+        # Gera os trechos da resposta à medida que chegam; registra TTFT e tempo total em `timings`.
+        # O relógio começa antes de montar o pedido, que pode incluir a chamada de resumo do histórico
+        start = time.perf_counter()
+        try:
+            contents, config = self.build_gemini_request(chat_history, mode, lang, context_text, history_state)
+            for chunk in self.gateway.stream(stats=timings, model=GEMINI_MODEL, contents=contents, config=config):
+                if not chunk.text: continue
+                timings.setdefault("ttft", time.perf_counter() - start)
+                yield chunk.text
+        finally:
+            timings["total_time"] = time.perf_counter() - start
+
+
+def create_mentor(settings, client=None, metrics=None):
+    # `client` permite injetar um client falso (benchmarks, testes offline) no lugar do genai.Client
+    client = client or create_client(settings.google_api_key, timeout_s=settings.gemini_timeout)
+    gateway = GeminiGateway(client, max_concurrency=settings.gemini_max_concurrency, max_retries=settings.gemini_max_retries)
+    context_cache = ContextCacheManager(client, GEMINI_MODEL, ttl_seconds=settings.context_cache_ttl) if settings.context_cache else None
+    return Mentor(settings, gateway, metrics or MetricsRegistry(jsonl_path=settings.metrics_jsonl), context_cache)
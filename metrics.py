@@ -0,0 +1,107 @@
+import json
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FIELDS = ("prompt_tokens", "cached_tokens", "context_tokens", "output_tokens", "ttft", "total_time", "retries")
+TOKEN_FIELDS = ("prompt_tokens", "cached_tokens", "context_tokens", "output_tokens")
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(int(round(p / 100 * (len(values) - 1))), len(values) - 1)]
+
+
+class MetricsRegistry:
+    # Guarda as últimas chamadas em memória (para percentis) e, opcionalmente, grava cada uma em JSONL
+
+    def __init__(self, window=1000, jsonl_path=None):
+        self.records = deque(maxlen=window)
+        self.jsonl_path = jsonl_path
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def record(self, kind, mode, lang, stats, error=None):
+        record = {"ts": time.time(), "kind": kind, "mode": mode, "lang": lang, "cache_hit": bool(stats.get("cache_hit")), "error": error}
+        record.update({field: stats[field] for field in FIELDS if stats.get(field) is not None})
+        with self._lock:
+            self.records.append(record)
+            labels = (kind, mode, lang, record["cache_hit"], error is not None)
+            self.counters[labels] = self.counters.get(labels, 0) + 1
+            for field in TOKEN_FIELDS:
+                self.counters[(field,)] = self.counters.get((field,), 0) + record.get(field, 0)
+            if self.jsonl_path:
+                with open(self.jsonl_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        return record
+
+    def summary(self, kind="chat"):
+        # Percentis por modo sobre a janela recente (respostas em cache entram só na taxa de acerto)
+        with self._lock:
+            records = [r for r in self.records if r["kind"] == kind]
+        rows = {}
+        for mode in sorted({r["mode"] for r in records}):
+            mode_records = [r for r in records if r["mode"] == mode]
+            generated = [r for r in mode_records if not r["cache_hit"] and not r["error"]]
+            latencies = [r["total_time"] for r in generated if "total_time" in r]
+            ttfts = [r["ttft"] for r in generated if "ttft" in r]
+            rows[mode] = {
+                "calls": len(mode_records),
+                "cache_hit_rate": sum(r["cache_hit"] for r in mode_records) / len(mode_records),
+                "errors": sum(bool(r["error"]) for r in mode_records),
+                "p50_latency": percentile(latencies, 50),
+                "p95_latency": percentile(latencies, 95),
+                "p50_ttft": percentile(ttfts, 50),
+                "p95_ttft": percentile(ttfts, 95),
+                "avg_prompt_tokens": sum(r.get("prompt_tokens", 0) for r in generated) / len(generated) if generated else None,
+                "avg_output_tokens": sum(r.get("output_tokens", 0) for r in generated) / len(generated) if generated else None,
+            }
+        return rows
+
+    def prometheus(self):
+        lines = ["# TYPE hmentor_calls_total counter"]
+        with self._lock:
+            counters = dict(self.counters)
+            records = list(self.records)
+        for labels, value in sorted(counters.items(), key=str):
+            if len(labels) == 5:
+                kind, mode, lang, cache_hit, error = labels
+                lines.append(f'hmentor_calls_total{{kind="{kind}",mode="{mode}",lang="{lang}",cache_hit="{str(cache_hit).lower()}",error="{str(error).lower()}"}} {value}')
+        lines.append("# TYPE hmentor_tokens_total counter")
+        for field in TOKEN_FIELDS:
+            lines.append(f'hmentor_tokens_total{{type="{field.replace("_tokens", "")}"}} {counters.get((field,), 0)}')
+        for field, name in (("total_time", "hmentor_latency_seconds"), ("ttft", "hmentor_ttft_seconds")):
+            lines.append(f"# TYPE {name} summary")
+            for mode in sorted({r["mode"] for r in records}):
+                values = [r[field] for r in records if r["mode"] == mode and field in r and not r["cache_hit"]]
+                for q in (50, 95, 99):
+                    value = percentile(values, q)
+                    if value is not None:
+                        lines.append(f'{name}{{mode="{mode}",quantile="{q / 100}"}} {value:.4f}')
+                lines.append(f'{name}_count{{mode="{mode}"}} {len(values)}')
+        return "\n".join(lines) + "\n"
+
+
+def start_metrics_server(registry, port, host="0.0.0.0"):
+    # Endpoint /metrics no formato texto do Prometheus, em uma thread daemon
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True, name="metrics-server").start()
+    return server
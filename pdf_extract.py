@@ -0,0 +1,123 @@
+import hashlib
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from pypdf import PdfReader
+from pypdf.generic import ArrayObject, DictionaryObject, IndirectObject, StreamObject
+
+from retrieval import PAGE_BREAK
+
+# Incrementar sempre que a extração mudar, para invalidar os artefatos em disco
+EXTRACTOR_VERSION = 3
+BACKENDS = ("auto", "pypdf", "pdfplumber")
+
+
+def needs_layout(text):
+    # Heurística sobre a saída do pypdf: página vazia ou quebrada em fragmentos curtos
+    # (tabelas e colunas) é reprocessada pelo pdfplumber, que ordena o texto pela posição
+    if not text or len(text.strip()) < 20:
+        return True
+    lines = [line for line in text.splitlines() if line.strip()]
+    if len(lines) < 10:
+        return False
+    fragments = sum(1 for line in lines if len(line.split()) <= 3)
+    return fragments / len(lines) > 0.6
+
+
+def _extract_pages(pdf_path, page_numbers, backend):
+    reader = PdfReader(pdf_path)
+    plumber = None
+    texts = []
+    try:
+        for page_no in page_numbers:
+            text = reader.pages[page_no - 1].extract_text() if backend != "pdfplumber" else None
+            if backend == "pdfplumber" or (backend == "auto" and needs_layout(text)):
+                if plumber is None:
+                    import pdfplumber
+                    plumber = pdfplumber.open(pdf_path)
+                text = plumber.pages[page_no - 1].extract_text()
+            texts.append(text or "")
+    finally:
+        if plumber is not None: plumber.close()
+    return texts
+
+
+def page_count(pdf_path):
+    return len(PdfReader(pdf_path).pages)
+
+
+def iter_pages(pdf_path, backend="auto", workers=None, batch_size=8, pages=None):
+    # Gera (número da página, texto) em ordem, à medida que cada lote de páginas fica pronto.
+    # `pages` restringe a extração a alguns números de página (a partir de 1); por padrão, todas.
+    if backend not in BACKENDS:
+        raise ValueError(f"unknown PDF backend: {backend}")
+    pages = list(range(1, page_count(pdf_path) + 1)) if pages is None else sorted(pages)
+    workers = min(workers or os.cpu_count() or 1, max(len(pages) // batch_size, 1))
+    batches = [pages[i:i + batch_size] for i in range(0, len(pages), batch_size)]
+
+    if workers <= 1:
+        for batch in batches:
+            yield from zip(batch, _extract_pages(pdf_path, batch, backend))
+        return
+
+    # "spawn" evita herdar as threads do servidor Streamlit nos processos filhos
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = [pool.submit(_extract_pages, pdf_path, batch, backend) for batch in batches]
+        for batch, future in zip(batches, futures):
+            yield from zip(batch, future.result())
+
+
+def extract_text(pdf_path, backend="auto", workers=None):
+    return "".join(text + "\n" + PAGE_BREAK for _, text in iter_pages(pdf_path, backend, workers))
+
+
+def _object_digest(obj, memo):
+    # Hash estrutural de um objeto do PDF, seguindo referências; `memo` guarda cada objeto indireto já visto,
+    # então fontes e XObjects compartilhados entre páginas são lidos uma única vez
+    if isinstance(obj, IndirectObject):
+        key = (obj.idnum, obj.generation)
+        if key not in memo:
+            memo[key] = b"cycle"  # Referência circular enquanto o objeto ainda está sendo percorrido
+            memo[key] = _object_digest(obj.get_object(), memo)
+        return memo[key]
+    digest = hashlib.sha256(type(obj).__name__.encode())
+    if isinstance(obj, DictionaryObject):
+        for name in sorted(obj):
+            if name == "/Parent": continue
+            digest.update(name.encode("utf-8", "replace") + _object_digest(obj.raw_get(name), memo))
+        if isinstance(obj, StreamObject):
+            digest.update(obj._data or b"")
+    elif isinstance(obj, ArrayObject):
+        for item in list.__iter__(obj):
+            digest.update(_object_digest(item, memo))
+    else:
+        digest.update(repr(obj).encode("utf-8", "replace"))
+    return digest.digest()
+
+
+def page_fingerprints(pdf_path):
+    # Hash de cada página sem extrair texto: fluxo de conteúdo + recursos resolvidos (fontes, ToUnicode e
+    # Form XObjects, recursivamente) + rotação. Páginas com o mesmo `q /X0 Do Q` mas XObjects diferentes não colidem.
+    memo = {}
+    hashes = []
+    for page in PdfReader(pdf_path).pages:
+        digest = hashlib.sha256()
+        contents = page.get_contents()
+        digest.update(contents.get_data() if contents is not None else b"")
+        for name in ("/Resources", "/Rotate"):
+            if name in page: digest.update(name.encode() + _object_digest(page.raw_get(name), memo))
+        hashes.append(digest.hexdigest()[:32])
+    return hashes
+
+
+def extract_incremental(pdf_path, known=None, backend="auto", workers=None):
+    # `known` mapeia hash de página -> texto da versão anterior; só as páginas com hash novo passam pelo extrator.
+    # Retorna o texto completo, os hashes de todas as páginas e os números das páginas reextraídas.
+    hashes = page_fingerprints(pdf_path)
+    # Hashes repetidos nesta versão tornariam o reaproveitamento ambíguo: extrai tudo de novo
+    known = known if known and len(set(hashes)) == len(hashes) else {}
+    changed = [page_no for page_no, digest in enumerate(hashes, start=1) if digest not in known]
+    extracted = dict(iter_pages(pdf_path, backend, workers, pages=changed)) if changed else {}
+    texts = [extracted[page_no] if page_no in extracted else known[digest] for page_no, digest in enumerate(hashes, start=1)]
+    return "".join(text + "\n" + PAGE_BREAK for text in texts), hashes, changed
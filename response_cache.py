@@ -0,0 +1,134 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from retrieval import STOPWORDS, normalize, tokenize
+
+# Palavras que a busca descarta, mas que mudam o sentido da pergunta: negação, comparação e intensidade,
+# além dos pronomes interrogativos ("Devo aumentar..." x "Não devo aumentar...")
+MEANINGFUL_STOPWORDS = set("""
+nao sem sim mais menos muito muita como quando onde qual quais quem
+not no without than how when where why what which who
+""".split())
+_SIMILARITY_STOPWORDS = STOPWORDS - MEANINGFUL_STOPWORDS
+
+
+def similarity_terms(text):
+    return set(tokenize(text, _SIMILARITY_STOPWORDS))
+
+
+def normalize_history(history):
+    return [(msg["role"], " ".join(normalize(msg["content"]).split())) for msg in history]
+
+
+class ResponseCache:
+    # Cache de respostas por (modo, idioma, histórico normalizado, hash do corpus), com LRU + TTL.
+    # Na primeira pergunta, aceita também perguntas parecidas (Jaccard sobre os termos) acima do limiar.
+
+    def __init__(self, max_entries=512, ttl_seconds=86400, similarity_threshold=0.85, clock=time.time):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.similar_hits = self.misses = 0
+        self.latency_saved = 0.0
+
+    @staticmethod
+    def cacheable(mode, history):
+        # Rodadas seguintes do Quiz precisam de perguntas novas, então não passam pelo cache
+        return not (mode == "Quiz" and sum(msg["role"] == "user" for msg in history) > 1)
+
+    @staticmethod
+    def key(mode, lang, history, corpus_hash):
+        return ResponseCache._key(mode, lang, corpus_hash, normalize_history(history))
+
+    @staticmethod
+    def _key(mode, lang, corpus_hash, normalized):
+        payload = repr((mode, lang, corpus_hash, normalized))
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, mode, lang, history, corpus_hash):
+        key = self.key(mode, lang, history, corpus_hash)
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry["expires_at"] <= now:
+                del self._entries[key]
+                entry = None
+            if entry is None and len(history) == 1 and self.similarity_threshold:
+                entry = self._similar(mode, lang, corpus_hash, similarity_terms(history[0]["content"]), now)
+                if entry: self.similar_hits += 1
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(entry["key"])
+            self.hits += 1
+            self.latency_saved += entry["latency"]
+            return entry["text"], entry["latency"]
+
+    def put(self, mode, lang, history, corpus_hash, text, latency=0.0, pages=None):
+        # `pages`: páginas do PDF usadas na resposta; sem elas, a entrada não sobrevive a uma atualização do corpus
+        normalized = normalize_history(history)
+        key = self._key(mode, lang, corpus_hash, normalized)
+        terms = similarity_terms(history[0]["content"]) if len(history) == 1 else None
+        with self._lock:
+            self._entries[key] = {
+                "key": key, "scope": (mode, lang, corpus_hash), "terms": terms, "history": normalized,
+                "pages": list(pages) if pages is not None else None,
+                "text": text, "latency": latency, "expires_at": self.clock() + self.ttl_seconds,
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _similar(self, mode, lang, corpus_hash, terms, now):
+        if not terms:
+            return None
+        best, best_score = None, self.similarity_threshold
+        for entry in self._entries.values():
+            if entry["terms"] is None or entry["scope"] != (mode, lang, corpus_hash) or entry["expires_at"] <= now:
+                continue
+            score = len(terms & entry["terms"]) / len(terms | entry["terms"])
+            if score >= best_score:
+                best, best_score = entry, score
+        return best
+
+    def rebase(self, old_hash, new_hash, page_map):
+        # Nova versão do corpus: respostas que só usaram páginas inalteradas passam para o novo hash
+        # (com as páginas renumeradas por `page_map`); as que tocaram páginas alteradas saem do cache
+        kept = dropped = 0
+        with self._lock:
+            entries = OrderedDict()
+            for key, entry in self._entries.items():
+                mode, lang, corpus_hash = entry["scope"]
+                if corpus_hash != old_hash:
+                    entries[key] = entry
+                elif entry["pages"] is None or any(page not in page_map for page in entry["pages"]):
+                    dropped += 1
+                else:
+                    entry["pages"] = [page_map[page] for page in entry["pages"]]
+                    entry["scope"] = (mode, lang, new_hash)
+                    entry["key"] = self._key(mode, lang, new_hash, entry["history"])
+                    entries[entry["key"]] = entry
+                    kept += 1
+            self._entries = entries
+        return kept, dropped
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "similar_hits": self.similar_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "latency_saved": self.latency_saved,
+            }
@@ -0,0 +1,180 @@
+import heapq
+import math
+import re
+import unicodedata
+from array import array
+
+# Separador de páginas usado por load_pdf_text (form feed, mesmo padrão do pdftotext)
+PAGE_BREAK = "\f"
+
+STOPWORDS = set("""
+a o as os um uma uns umas de do da dos das em no na nos nas por pelo pela pelos pelas para
+com sem sob sobre entre ate e ou mas que se como quando onde qual quais quem cujo ao aos
+eu tu ele ela nos vos eles elas meu minha seu sua seus suas isso isto esse essa este esta
+ser estar ter foi sao era sera tem ha nao sim mais menos muito muita segundo material texto
+the an of in on at by for with without to from and or but if as is are was were be been
+this that these those it its what which who whom how when where why do does did not no
+can could should would will about into than then so such your you my our their
+""".split())
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def normalize(text):
+    text = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+
+def tokenize(text, stopwords=STOPWORDS):
+    return [tok for tok in _TOKEN_RE.findall(normalize(text)) if len(tok) > 1 and tok not in stopwords]
+
+
+def estimate_tokens(text):
+    # Aproximação padrão (~4 caracteres por token) - suficiente para comparar prompts
+    return len(text) // 4 if text else 0
+
+
+def chunk_pages(text, chunk_size=300):
+    # Divide o texto por página e, dentro da página, por blocos de linhas até ~chunk_size tokens.
+    # Retorna os offsets de cada página e os trechos (página, início, fim), em bytes UTF-8 no texto completo.
+    max_bytes = max(chunk_size, 1) * 4
+    data = text.encode("utf-8")
+    chunks = []
+    page_offsets = array("I", [0])
+    page_start = 0
+    pages = data.split(PAGE_BREAK.encode())
+    if len(pages) > 1 and not pages[-1]: pages.pop()
+    for page_no, page in enumerate(pages, start=1):
+        start = end = page_start
+        for line in page.splitlines(keepends=True):
+            if end > start and (end - start) + len(line) > max_bytes:
+                chunks.append((page_no, start, end))
+                start = end
+            end += len(line)
+        if end > start and data[start:end].strip():
+            chunks.append((page_no, start, end))
+        page_start += len(page) + 1
+        page_offsets.append(min(page_start, len(data)))
+    return data, page_offsets, chunks
+
+
+class BM25Index:
+    # Índice léxico BM25 em arrays planos (postings contíguos), sem dependências externas
+
+    def __init__(self, data, page_offsets, chunk_pages, chunk_starts, chunk_ends, term_data, term_offsets, post_offsets, post_docs, post_tfs, doc_lens, k1=1.5, b=0.75):
+        self.data = data
+        self.page_offsets = page_offsets
+        self.chunk_pages = chunk_pages
+        self.chunk_starts = chunk_starts
+        self.chunk_ends = chunk_ends
+        # Vocabulário ordenado como um bloco UTF-8 + offsets: buscado por bisseção, sem dict em memória,
+        # para que vários processos compartilhem o mesmo buffer (mmap ou memória compartilhada) sem cópia
+        self.term_data = term_data
+        self.term_offsets = term_offsets
+        self.post_offsets = post_offsets
+        self.post_docs = post_docs
+        self.post_tfs = post_tfs
+        self.doc_lens = doc_lens
+        self.k1 = k1
+        self.b = b
+        self.avgdl = (sum(doc_lens) / len(doc_lens)) if len(doc_lens) else 0.0
+
+    @classmethod
+    def build(cls, text, chunk_size=300):
+        data, page_offsets, chunks = chunk_pages(text, chunk_size)
+        postings = {}
+        doc_lens = array("I")
+        for doc_id, (_, start, end) in enumerate(chunks):
+            tokens = tokenize(data[start:end].decode("utf-8", "ignore"))
+            doc_lens.append(len(tokens))
+            counts = {}
+            for tok in tokens:
+                counts[tok] = counts.get(tok, 0) + 1
+            for tok, tf in counts.items():
+                postings.setdefault(tok, []).append((doc_id, tf))
+
+        # A ordem de str coincide com a ordem dos bytes UTF-8, então a bisseção pode comparar bytes
+        terms = sorted(postings)
+        term_data, term_offsets = bytearray(), array("I", [0])
+        post_offsets, post_docs, post_tfs = array("I", [0]), array("I"), array("I")
+        for term in terms:
+            term_data += term.encode("utf-8")
+            term_offsets.append(len(term_data))
+            for doc_id, tf in postings[term]:
+                post_docs.append(doc_id)
+                post_tfs.append(tf)
+            post_offsets.append(len(post_docs))
+
+        return cls(
+            data,
+            page_offsets,
+            array("I", (c[0] for c in chunks)),
+            array("I", (c[1] for c in chunks)),
+            array("I", (c[2] for c in chunks)),
+            bytes(term_data), term_offsets, post_offsets, post_docs, post_tfs, doc_lens,
+        )
+
+    def term_id(self, term):
+        key = term.encode("utf-8")
+        lo, hi = 0, len(self.term_offsets) - 1
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if bytes(self.term_data[self.term_offsets[mid]:self.term_offsets[mid + 1]]) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(self.term_offsets) - 1 and bytes(self.term_data[self.term_offsets[lo]:self.term_offsets[lo + 1]]) == key:
+            return lo
+        return None
+
+    def __len__(self):
+        return len(self.doc_lens)
+
+    @property
+    def total_tokens(self):
+        return len(self.data) // 4
+
+    @property
+    def page_count(self):
+        return len(self.page_offsets) - 1
+
+    @property
+    def text(self):
+        return bytes(self.data).decode("utf-8", "ignore")
+
+    def page_text(self, page_no):
+        return bytes(self.data[self.page_offsets[page_no - 1]:self.page_offsets[page_no]]).decode("utf-8", "ignore").rstrip(PAGE_BREAK)
+
+    def chunk_text(self, chunk_id):
+        return bytes(self.data[self.chunk_starts[chunk_id]:self.chunk_ends[chunk_id]]).decode("utf-8", "ignore").strip()
+
+    def search(self, query, k=6, doc_ranges=None):
+        # doc_ranges: intervalos [início, fim) de trechos aos quais a busca fica restrita (ex: um curso)
+        n_docs = len(self.doc_lens)
+        if not n_docs:
+            return []
+        scores = {}
+        for term in set(tokenize(query)):
+            term_id = self.term_id(term)
+            if term_id is None:
+                continue
+            lo, hi = self.post_offsets[term_id], self.post_offsets[term_id + 1]
+            df = hi - lo
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            for i in range(lo, hi):
+                doc_id, tf = self.post_docs[i], self.post_tfs[i]
+                if doc_ranges and not any(start <= doc_id < end for start, end in doc_ranges):
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lens[doc_id] / (self.avgdl or 1))
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+    def passages(self, query, k=6, doc_ranges=None):
+        # Top-k trechos reordenados pela ordem do documento, para preservar a sequência do curso
+        hits = sorted(self.search(query, k, doc_ranges), key=lambda item: item[0])
+        return [(self.chunk_pages[doc_id], self.chunk_text(doc_id)) for doc_id, _ in hits]
+
+
+def format_passages(passages, label=None):
+    label = label or (lambda page: f"p. {page}")
+    return "\n\n".join(f"[{label(page)}]\n{text}" for page, text in passages)
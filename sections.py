@@ -0,0 +1,156 @@
+import re
+from bisect import bisect_left
+
+from retrieval import normalize, tokenize
+
+# Os 6 cursos do programa, com os termos usados para reconhecer os títulos no PDF e para rotear perguntas.
+# Termos de roteamento já estão normalizados (minúsculas, sem acento) e casam com a palavra inteira;
+# os terminados em "*" são radicais e casam como prefixo (todos com 5+ letras, para não pegar "customer" em "custo").
+COURSES = {
+    "Marketing": {
+        "titles": ["marketing"],
+        "terms": ["marketing", "4ps", "preco", "precos", "precific*", "pricing", "price", "prices", "marca", "marcas", "brand", "brands", "branding",
+                  "posicionamento", "positioning", "segmenta*", "segment", "segments", "promoca*", "promocoes", "promotion*", "premium", "publicidade", "advertising"],
+    },
+    "Finanças": {
+        "titles": ["financas", "finance", "financial"],
+        "terms": ["financ*", "roi", "fluxo", "caixa", "cash", "lucro", "lucros", "lucrativ*", "profit*", "dre", "balanco", "balance", "margem", "margens",
+                  "margin", "margins", "invest", "investir", "investimento*", "investment*", "investor*", "investid*", "orcamento*", "budget*",
+                  "custo", "custos", "cost", "costs", "receita", "receitas", "revenue*", "gasto", "gastos"],
+    },
+    "Negociação": {
+        "titles": ["negociacao", "negotiation", "negotiating"],
+        "terms": ["negocia*", "negotiat*", "batna", "zopa", "acordo", "acordos", "agreement*", "concess*", "desconto*", "discount*",
+                  "fornecedor*", "supplier*", "barganha*", "bargain*"],
+    },
+    "Relacionamento com o Cliente": {
+        "titles": ["relacionamento com o cliente", "customer relations", "customer relationship", "customer relationships", "customer service"],
+        "terms": ["cliente", "clientes", "customer", "customers", "fideliza*", "loyal", "loyalty", "satisfacao", "satisfeito*", "satisfaction",
+                  "reclama*", "complain*", "atendimento", "service", "atraso", "atrasos", "atrasad*", "delay", "delays", "delayed",
+                  "retencao", "retention", "churn"],
+    },
+    "Liderança": {
+        "titles": ["lideranca", "leadership", "leading people", "leading teams"],
+        "terms": ["lider*", "leader*", "equipe", "equipes", "team", "teams", "chefe", "chefes", "boss", "talento*", "talent*", "feedback",
+                  "motiva*", "motivat*", "delega*", "delegat*", "conflito*", "conflict*", "coaching"],
+    },
+    "Business Fundamentals": {
+        "titles": ["business fundamentals", "fundamentos de negocios", "fundamentos empresariais"],
+        "terms": ["estrategi*", "strateg*", "execucao", "execution", "executar", "decisao", "decisoes", "decision*", "prioridade*", "prioriz*",
+                  "priorit*", "metas", "goal", "goals", "indicador*", "kpi", "kpis", "okr", "okrs", "processo*", "process", "processes"],
+    },
+}
+
+# Cenas de Roleplay sem tema explícito caem nos cursos de negociação, cliente e liderança
+ROLEPLAY_DEFAULT = ["Negociação", "Relacionamento com o Cliente", "Liderança"]
+
+_HEADING_MAX_CHARS = 80
+_HEADING_MAX_WORDS = 8
+_HEADING_PREFIX = re.compile(r"^(modulo|module|capitulo|chapter|curso|course|unidade|unit|parte|part)\b|^\d+[.:)]?\s")
+
+
+def match_course(title):
+    title = normalize(title)
+    for course, spec in COURSES.items():
+        if any(re.search(rf"\b{re.escape(alias)}\b", title) for alias in spec["titles"]):
+            return course
+    return None
+
+
+def _term_matches(token, term):
+    return token.startswith(term[:-1]) if term.endswith("*") else token == term
+
+
+def is_heading(line):
+    # Linha com cara de título: curta, sem pontuação de frase e numerada ("Módulo 3: ...", "2. ...")
+    # ou em caixa alta / com as palavras principais capitalizadas
+    if len(line) > _HEADING_MAX_CHARS or len(line.split()) > _HEADING_MAX_WORDS or line[-1] in ".,;:?!":
+        return False
+    if _HEADING_PREFIX.match(normalize(line)) or line.isupper():
+        return True
+    words = [word for word in line.split() if len(word) > 3]
+    return bool(words) and all(word[0].isupper() for word in words)
+
+
+def _outline_sections(pdf_path):
+    from pypdf import PdfReader
+
+    reader = PdfReader(pdf_path)
+    starts = []
+
+    def walk(items, course):
+        last = None
+        for item in items:
+            if isinstance(item, list):
+                walk(item, last or course)
+                continue
+            try:
+                page = reader.get_destination_page_number(item) + 1
+            except Exception:
+                continue
+            last = match_course(item.title) or course
+            starts.append((page, last, item.title.strip()))
+
+    walk(reader.outline, None)
+    return sorted(starts, key=lambda start: start[0])  # Estável: na mesma página vale a ordem do sumário
+
+
+def _heading_sections(index):
+    # Sem sumário no PDF: procura o nome de um curso nas primeiras linhas curtas de cada página
+    starts = []
+    current = None
+    for page in range(1, index.page_count + 1):
+        lines = [line.strip() for line in index.page_text(page).splitlines() if line.strip()][:3]
+        for line in lines:
+            course = match_course(line) if is_heading(line) else None
+            if course and course != current:
+                starts.append((page, course, line))
+                current = course
+                break
+    return starts
+
+
+def detect_sections(pdf_path, index):
+    # Lista de seções {course, title, start_page, end_page, chunk_start, chunk_end}, calculada uma vez na ingestão
+    try:
+        starts = [s for s in _outline_sections(pdf_path) if s[1]]
+    except Exception:
+        starts = []
+    if not starts:
+        starts = _heading_sections(index)
+
+    sections = []
+    for i, (page, course, title) in enumerate(starts):
+        end_page = starts[i + 1][0] - 1 if i + 1 < len(starts) else index.page_count
+        if end_page < page:
+            continue
+        sections.append({
+            "course": course,
+            "title": title,
+            "start_page": page,
+            "end_page": end_page,
+            "chunk_start": bisect_left(index.chunk_pages, page),
+            "chunk_end": bisect_left(index.chunk_pages, end_page + 1),
+        })
+    return sections
+
+
+def route_courses(text, mode):
+    # Cursos citados na conversa; vazio significa usar o corpus inteiro
+    tokens = tokenize(text)
+    scores = {}
+    for course, spec in COURSES.items():
+        hits = sum(1 for tok in tokens for term in spec["terms"] if _term_matches(tok, term))
+        if hits: scores[course] = hits
+    if not scores:
+        return list(ROLEPLAY_DEFAULT) if mode == "Roleplay" else []
+    best = max(scores.values())
+    # Mantém cursos com pelo menos metade dos acertos do melhor, para perguntas que cruzam temas
+    return [course for course, hits in sorted(scores.items(), key=lambda item: -item[1]) if hits * 2 >= best]
+
+
+def section_for_page(sections, page):
+    for section in sections:
+        if section["start_page"] <= page <= section["end_page"]:
+            return section
+    return None
@@ -0,0 +1,55 @@
+import argparse
+import os
+import signal
+import subprocess
+import sys
+
+from corpus_cache import artifact_path, publish_shared
+from mentor import Settings, build_retrieval_index, read_secret
+
+# Sobe N workers do Streamlit no mesmo host. O PDF é baixado e indexado uma única vez aqui; o artefato
+# vai para a memória compartilhada e cada worker anexa o mesmo segmento (CORPUS_SHM), sem cópia própria.
+
+PDF_PATH = "Harvard Manager Mentor.pdf"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Harvard Manager Mentor com vários workers e corpus compartilhado")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--port", type=int, default=8501, help="porta do primeiro worker; os demais usam as seguintes")
+    parser.add_argument("--shm-name", default=f"hmentor-{os.getpid()}")
+    args, streamlit_args = parser.parse_known_args()
+
+    settings = Settings.from_source(read_secret)
+    index = build_retrieval_index(PDF_PATH, settings)
+    if index is None:
+        sys.exit("Não foi possível baixar ou indexar o PDF.")
+    meta = index.meta
+    path = artifact_path(settings.corpus_cache_dir, meta["pdf_sha256"], meta["extractor_version"], meta["chunk_size"])
+    del index
+    shm = publish_shared(path, args.shm_name)
+    print(f"Corpus publicado em /dev/shm/{args.shm_name} ({shm.size / 1e6:.1f} MB)", flush=True)
+
+    env = {**os.environ, "CORPUS_SHM": args.shm_name}
+    workers = []
+    try:
+        for i in range(args.workers):
+            cmd = [sys.executable, "-m", "streamlit", "run", "app.py", "--server.port", str(args.port + i), "--server.headless", "true", *streamlit_args]
+            workers.append(subprocess.Popen(cmd, env=env))
+        signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+        for worker in workers:
+            worker.wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for worker in workers:
+            if worker.poll() is None: worker.terminate()
+        for worker in workers:
+            try: worker.wait(timeout=10)
+            except subprocess.TimeoutExpired: worker.kill()
+        shm.close()
+        shm.unlink()
+
+
+if __name__ == "__main__":
+    main()